@@ -1,28 +1,158 @@
 import logging
+import marshal
+import os
+import sys
 
 import components
 import ruamel.yaml as yaml
 
+# Mandatory parameters at each level of the configuration file
+ROOT_FIELDS = frozenset(('name', 'init_state', 'devices', 'states', 'transitions'))
+TARGET_FIELDS = frozenset(('target', 'limits'))
+
+# Version of the checks run on configurations. Must be increased whenever the logic of check_config() changes, so that
+# configurations cached under older rules are checked again. Changes to the required fields are detected on their own
+CHECKS_VERSION = 1
+
+# Instances handed out by ConfigManager.load, keyed by (absolute path, mtime, load options)
+_instances = {}
+
+
+def _merge(dst, src):
+    """
+    Recursively copies the values in src into dst. Containers already present in dst are updated in place, so any
+    round-trip information attached to them (comments, flow style) is kept.
+
+    :param dst: YAML config object
+        The round-trip configuration object to be updated
+    :param src: dict or list
+        The plain configuration object holding the new values
+    """
+    items = src.items() if isinstance(src, dict) else enumerate(src)
+    for key, value in items:
+        old = dst[key] if isinstance(dst, list) or key in dst else None
+        if isinstance(old, dict) and isinstance(value, dict):
+            _merge(old, value)
+        elif isinstance(old, list) and isinstance(value, (list, tuple)) and len(old) == len(value):
+            _merge(old, value)
+        else:
+            dst[key] = value
+
+
+def _to_plain(config):
+    """
+    :param config: YAML config object
+        A (possibly round-trip) configuration object
+    :return: A deep copy of config made of plain dicts and lists
+    """
+    if isinstance(config, dict):
+        return {key: _to_plain(value) for key, value in config.items()}
+    if isinstance(config, list):
+        return [_to_plain(value) for value in config]
+    return config
+
+
+def _intern_keys(mapping):
+    """
+    :param mapping: dict
+        A plain configuration mapping
+    :return: A copy of mapping with all of its str keys interned
+    """
+    return {sys.intern(key) if isinstance(key, str) else key: value for key, value in mapping.items()}
+
+
+def _intern_names(config):
+    """
+    Interns the Device and State names in a plain configuration object, in place. Names declared in one section
+    and mentioned in another then share a single str object, so the lookups done while checking the configuration
+    and running the Governor match on identity.
+
+    :param config: dict
+        The plain configuration object created from the YAML file.
+    """
+    if not isinstance(config, dict):
+        return
+
+    for section in ('devices', 'states', 'transitions'):
+        if isinstance(config.get(section), dict):
+            config[section] = _intern_keys(config[section])
+
+    if isinstance(config.get('init_state'), str):
+        config['init_state'] = sys.intern(config['init_state'])
+
+    for state in config.get('states', {}).values():
+        if isinstance(state, dict) and isinstance(state.get('targets'), dict):
+            state['targets'] = _intern_keys(state['targets'])
+
+    for origin, transition in config.get('transitions', {}).items():
+        if isinstance(transition, dict):
+            config['transitions'][origin] = _intern_keys(transition)
+
 
 class ConfigManager:
     """ Represents a YAML configuration file that describes a Governor. Acts like a dictionary. """
+    __slots__ = ('_logger', '_filename', '_cache_filename', '_mutable', '_fail_fast', '_raw_config', '_plain', 'ok')
 
-    def __init__(self, filename):
+    def __init__(self, filename, mutable=True, fail_fast=False, use_cache=True):
         """
         :param filename: str
             Backing YAML configuration file.
+        :param mutable: bool
+            Whether to keep a round-trip representation of the file. When False, the file is parsed with the faster
+            safe loader and commit() merges the changes into a fresh round-trip parse of the file. Default: True.
+        :param fail_fast: bool
+            Whether to stop checking the configuration at the first error instead of reporting all of them.
+            Default: False.
+        :param use_cache: bool
+            Whether a configuration that was already checked may be loaded from its cache file. When False, the file
+            is always parsed and checked. Default: True.
         """
         self._logger = logging.getLogger("ConfigManager")
         self._filename = filename
+        self._cache_filename = filename + '.cache'
+        self._mutable = mutable
+        self._fail_fast = fail_fast
+
+        # A valid plain configuration is cached next to the file, so warm starts skip parsing and checking
+        if mutable or not use_cache or not self._load_cache():
+            with open(filename) as f:
+                if mutable:
+                    # round_trip_load allows us to write back to the config file when settings change
+                    self._raw_config = yaml.round_trip_load(f)
+                else:
+                    # The safe loader uses libyaml when available and builds plain dicts and lists
+                    self._raw_config = yaml.YAML(typ='safe').load(f)
+                    _intern_names(self._raw_config)
 
-        with open(filename) as f:
-            # round_trip_load allows us to write back to the config file when settings change
-            self._raw_config = yaml.round_trip_load(f)
+            self.ok = self.check_config()
+            if self.ok and not mutable:
+                self._save_cache()
 
-        self.ok = self.check_config()
         if not self.ok:
             self._logger.error("Invalid config file '%s'", filename)
 
+    @classmethod
+    def load(cls, filename, mutable=True, fail_fast=False, use_cache=True):
+        """
+        Returns a shared ConfigManager for a configuration file. The file is only parsed and checked again if it
+        was modified since the last call.
+
+        :param filename: str
+            Backing YAML configuration file.
+        :param mutable: bool
+            See ConfigManager(). Default: True.
+        :param fail_fast: bool
+            See ConfigManager(). Default: False.
+        :param use_cache: bool
+            See ConfigManager(). Default: True.
+        :return: A ConfigManager object for filename
+        """
+        key = (os.path.abspath(filename), os.stat(filename).st_mtime_ns, mutable, fail_fast, use_cache)
+        config = _instances.get(key)
+        if config is None:
+            config = _instances[key] = cls(filename, mutable, fail_fast, use_cache)
+        return config
+
     def get(self, key, default=None):
         return self._raw_config.get(key, default)
 
@@ -37,8 +167,71 @@ class ConfigManager:
         """
         Writes changes back to the backing configuration file
         """
+        if self._mutable:
+            config = self._raw_config
+        else:
+            # Plain data carries no comments: merge it into a round-trip parse of the file to preserve them
+            with open(self._filename) as f:
+                config = yaml.round_trip_load(f)
+            _merge(config, self._raw_config)
+
         with open(self._filename, 'w') as f:
-            yaml.round_trip_dump(self._raw_config, f)
+            yaml.round_trip_dump(config, f)
+
+        # The file changed: don't hand out this instance from load() anymore
+        for key in [key for key, instance in _instances.items() if instance is self]:
+            del _instances[key]
+
+        # Keep the cache in sync with the file, so the next start doesn't need to parse it again
+        if not self._mutable:
+            self._save_cache()
+
+    def _cache_key(self):
+        """
+        :return: A key that changes whenever the backing configuration file or the configuration checks change.
+        """
+        stat = os.stat(self._filename)
+        required_fields = tuple(sorted(
+            (name, tuple(sorted(device_type.REQUIRED_FIELDS)))
+            for name, device_type in components.device_types_registry.items()
+        ))
+        rules = (CHECKS_VERSION, tuple(sorted(ROOT_FIELDS)), tuple(sorted(TARGET_FIELDS)), required_fields)
+        return rules, stat.st_mtime_ns, stat.st_size
+
+    def _load_cache(self):
+        """
+        Loads the configuration from the cache file, if the cache is up to date with the backing configuration file.
+
+        :return: True if the configuration was loaded from the cache, False otherwise.
+        """
+        try:
+            with open(self._cache_filename, 'rb') as f:
+                # Unlike pickle, marshal never runs code while loading, so a tampered cache can only change data
+                cache = marshal.load(f)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            self._logger.debug("Ignoring unreadable cache file '%s': %s", self._cache_filename, e)
+            return False
+
+        if not isinstance(cache, dict) or cache.get('key') != self._cache_key():
+            return False
+
+        self._raw_config = cache['data']
+        self.ok = True
+        return True
+
+    def _save_cache(self):
+        """
+        Writes the (already checked) configuration to the cache file. Failing to do so is not an error.
+        """
+        tmp_filename = self._cache_filename + '.tmp'
+        try:
+            with open(tmp_filename, 'wb') as f:
+                marshal.dump({'key': self._cache_key(), 'data': self._raw_config}, f)
+            os.replace(tmp_filename, self._cache_filename)
+        except (OSError, ValueError) as e:
+            self._logger.debug("Couldn't write cache file '%s': %s", self._cache_filename, e)
 
     def check_config(self):
         """
@@ -46,33 +239,39 @@ class ConfigManager:
 
         :return: True if the configuration file is OK, False otherwise
         """
-        checks = [self._check_root_mandatory, self._check_init_state,
-                  self._check_devices, self._check_states, self._check_limits,
-                  self._check_transitions]
-
-        for check in checks:
-            if not check():
+        # Round-trip containers are slower to index than plain ones, so the checks run on a plain copy
+        self._plain = _to_plain(self._raw_config) if self._mutable else self._raw_config
+        try:
+            if not self._check_root_mandatory():
                 return False
-        return True
 
-    def _check_mandatory(self, mandatory_params, config, where):
+            for check in self._CHECKS:
+                if not check(self):
+                    return False
+            return True
+        finally:
+            self._plain = None
+
+    def _check_mandatory(self, mandatory_params, config, where, *where_args):
         """
         Checks that all parameters in mandatory_parameters are present in config.
 
-        :param mandatory_params: list of str
-            List of parameter names that must be present in config.
+        :param mandatory_params: frozenset of str
+            Set of parameter names that must be present in config.
         :param config: YAML config object
             The configuration object to be checked
         :param where: str
-            Description of the configuration location. It will be printed if the check fails.
+            Description of the configuration location, as a %-format string. It will be printed if the check fails.
+        :param where_args:
+            Arguments for the where format string. They are only formatted if the check fails.
         :return: True if all parameters in mandatory_parameters are in config, False otherwise.
         """
-        ok = True
-        for param in mandatory_params:
-            if param not in config:
-                self._logger.error("Missing mandatory parameter '%s' in '%s'", param, where)
-                ok = False
-        return ok
+        missing = mandatory_params - config.keys()
+        if missing:
+            params = ", ".join("'{}'".format(param) for param in sorted(missing))
+            self._logger.error("Missing mandatory parameter(s) %s in '" + where + "'", params, *where_args)
+            return False
+        return True
 
     def _check_root_mandatory(self):
         """
@@ -80,7 +279,7 @@ class ConfigManager:
 
         :return: True if it has, False otherwise.
         """
-        return self._check_mandatory(('init_state', 'devices', 'states'), self._raw_config, "root")
+        return self._check_mandatory(ROOT_FIELDS, self._plain, "root")
 
     def _check_type(self, name, device):
         """
@@ -89,12 +288,12 @@ class ConfigManager:
         :param name: str
             The name of the Device being checked
         :param device: YAML config object for a Device
-        :return: True if the Device's type is valid, False otherwise
+        :return: The Device type class if the Device's type is valid, None otherwise
         """
-        if device['type'] not in components.device_types_registry:
-            self._logger.error("device[{}] type can only be one of {}".format(name, tuple(components.device_types_registry.keys())))
-            return False
-        return True
+        device_type = components.device_types_registry.get(device['type'])
+        if device_type is None:
+            self._logger.error("device[%s] type can only be one of %s", name, components.device_types_registry_keys)
+        return device_type
 
     def _check_devices(self):
         """
@@ -103,71 +302,74 @@ class ConfigManager:
         :return: True if all Devices have valid configurations, False otherwise.
         """
         ok = True
-        for name, device in self._raw_config['devices'].items():
-            fmt_name = "device[{}]".format(name)
+        for name, device in self._plain['devices'].items():
             # Every Device must have a 'type'
-            if not self._check_mandatory(('type', ), device, fmt_name):
+            if 'type' not in device:
+                self._logger.error("Missing mandatory parameter(s) 'type' in 'device[%s]'", name)
                 ok = False
+                if self._fail_fast:
+                    return False
             else:
                 # The Device's type must be valid
-                if not self._check_type(name, device):
+                device_type = self._check_type(name, device)
+                if device_type is None:
                     ok = False
-
+                    if self._fail_fast:
+                        return False
                 # Each Device type requires different mandatory parameters
-                required_fields = components.device_types_registry[device['type']].REQUIRED_FIELDS
-                if not self._check_mandatory(required_fields, device, fmt_name):
+                elif not self._check_mandatory(device_type.REQUIRED_FIELDS, device, "device[%s]", name):
                     ok = False
+                    if self._fail_fast:
+                        return False
         return ok
 
     def _check_states(self):
         """
-        Checks all State's configuration for validity.
+        Checks all State's configuration for validity, including their limits. The limits are *relative* to the
+        target position.
 
         :return: True if all States have valid configurations, False otherwise.
         """
         ok = True
-        for name, state in self._raw_config['states'].items():
+        err = self._logger.error
+        devices = self._plain['devices']
+        for name, state in self._plain['states'].items():
             for device_name, device_target in state.get('targets', {}).items():
                 # Check that all Devices mentioned by the State were declared before
-                if device_name not in self._raw_config['devices']:
+                cfg = devices.get(device_name)
+                if cfg is None:
                     msg = "State '%s' mentions unknown device '%s'"
-                    self._logger.error(msg, name, device_name)
+                    err(msg, name, device_name)
                     ok = False
+                    if self._fail_fast:
+                        return False
                     continue
 
                 # Every State definition must contain a 'target' and a 'limits' parameter
-                target_name = ""
-                where = "state[{}] device[{}]".format(name, device_name)
-                if not self._check_mandatory(('target', 'limits'), device_target, where):
+                if not self._check_mandatory(TARGET_FIELDS, device_target, "state[%s] device[%s]", name, device_name):
                     ok = False
-                else:
-                    target_name = device_target['target']
+                    if self._fail_fast:
+                        return False
+                    continue
 
                 # The Target defined by this State must have been declared before in the Device definition
-                cfg = self._raw_config['devices'][device_name]
-                if 'positions' in cfg and target_name not in cfg['positions']:
+                target_name = device_target['target']
+                positions = cfg.get('positions')
+                if positions is not None and target_name not in positions:
                     msg = "State '%s' device '%s' invalid target: %s"
-                    self._logger.error(msg, name, device_name, device_target['target'])
+                    err(msg, name, device_name, target_name)
                     ok = False
-        return ok
-
-    def _check_limits(self):
-        """
-        Checks if all States limits are valid. The limits are *relative* to the target position.
+                    if self._fail_fast:
+                        return False
 
-        :return: True if all States limits are valid, False otherwise.
-        """
-        ok = True
-        for state_name, state in self._raw_config['states'].items():
-            if 'targets' not in state:
-                continue
-            for device, device_target in state['targets'].items():
-                target_name, limits = device_target['target'], tuple(device_target['limits'])
+                # The lower limit can't exceed the upper limit
+                limits = device_target['limits']
                 if limits[0] > limits[1]:
                     msg = "State '%s' device '%s' target '%s' lower limit[%f] > upper limit[%f]"
-                    self._logger.error(msg, state_name, device, target_name, *limits)
+                    err(msg, name, device_name, target_name, limits[0], limits[1])
                     ok = False
-                    continue
+                    if self._fail_fast:
+                        return False
         return ok
 
     def _check_transitions(self):
@@ -177,47 +379,60 @@ class ConfigManager:
         :return: True if all Transitions are valid, False otherwise.
         """
         ok = True
-        for origin, transition in self._raw_config['transitions'].items():
+        err = self._logger.error
+        devices, states = self._plain['devices'], self._plain['states']
+        invalid_msg = "Transition %s->%s contains invalid device '%s'"
+        not_in_dest_msg = "Transition %s->%s sequence moves a device '%s' that is not part of the destination"
+        for origin, transition in self._plain['transitions'].items():
             # The origin of a Transition must have been declared before
-            if origin not in self._raw_config['states']:
+            if origin not in states:
                 msg = "Invalid transition origin '%s'"
-                self._logger.error(msg, origin)
+                err(msg, origin)
                 ok = False
+                if self._fail_fast:
+                    return False
 
             for destination, sequence in transition.items():
                 # The destination of a Transition must have been declared before
-                if destination not in self._raw_config['states']:
+                destination_state = states.get(destination)
+                if destination_state is None:
                     msg = "Invalid transition destination '%s'"
-                    self._logger.error(msg, destination)
+                    err(msg, destination)
                     ok = False
+                    if self._fail_fast:
+                        return False
 
                 # Can't have a Transition from and to the same State
                 if origin == destination:
                     msg = "Transition to '%s'"
-                    self._logger.error(msg, origin)
+                    err(msg, origin)
                     ok = False
+                    if self._fail_fast:
+                        return False
 
-                # All devices mentioned in a Transition must have been declared before
+                # Collect all devices moved by the Transition
                 sequence_devices = set()
-                for device_name in sequence:
-                    if isinstance(device_name, str):
-                        sequence_devices.add(device_name)
+                for item in sequence:
+                    if isinstance(item, str):
+                        sequence_devices.add(item)
                     else:
-                        sequence_devices |= set(device_name)
+                        sequence_devices.update(item)
 
-                msg = "Transition %s->%s contains invalid device '%s'"
+                # All devices mentioned in a Transition must have been declared before and be part of the target State
+                # An undeclared destination was already reported: its targets are unknown
+                destination_targets = destination_state.get('targets', {}) if destination_state is not None else None
                 for device_name in sequence_devices:
-                    if device_name not in self._raw_config['devices']:
-                        self._logger.error(msg, origin, destination, device_name)
+                    if device_name not in devices:
+                        err(invalid_msg, origin, destination, device_name)
                         ok = False
+                        if self._fail_fast:
+                            return False
 
-                # All devices mentioned in a Transition must be part of the target State
-                msg = "Transition %s->%s sequence moves a device '%s' that is not part of the destination"
-                destination_state = self._raw_config['states'][destination]
-                for device_name in sequence_devices:
-                    if device_name not in destination_state['targets']:
-                        self._logger.error(msg, origin, destination, device_name)
+                    if destination_targets is not None and device_name not in destination_targets:
+                        err(not_in_dest_msg, origin, destination, device_name)
                         ok = False
+                        if self._fail_fast:
+                            return False
 
                 # All devices in the destination must be moved to get there
                 # This might be too strict, leave it out for now
@@ -235,8 +450,11 @@ class ConfigManager:
 
         :return: True if an initial State was properly defined, False otherwise.
         """
-        if self._raw_config['init_state'] not in self._raw_config['states']:
+        if self._plain['init_state'] not in self._plain['states']:
             msg = "Invalid init state: '%s'"
-            self._logger.error(msg, self._raw_config['init_state'])
+            self._logger.error(msg, self._plain['init_state'])
             return False
         return True
+
+    # Checks run in order by check_config after _check_root_mandatory, until one of them fails
+    _CHECKS = (_check_init_state, _check_devices, _check_states, _check_transitions)
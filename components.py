@@ -1,36 +1,42 @@
 import time
 import logging
 import epics
-import copy
+import weakref
+from types import MappingProxyType
 
-from threading import Thread, Lock
+from threading import Thread, Lock, Event, Condition
+from collections import deque
 from queue import Queue, Empty
+from concurrent.futures import ThreadPoolExecutor, wait
 
 class Target:
     """
     Represents a Target entity. A Target is part of a State: it has a name (which is a named position of a Device),
     limits and a flag 'updateAfter' if its value must be updated after leaving the State.
     """
+    __slots__ = ('_config', '_target', '_limits', '_update_after')
+
     def __init__(self, config):
         self._config = config
+        self._target = config['target']
+        self._limits = tuple(config['limits'])
+        self._update_after = config.get('updateAfter', False)
 
     def __repr__(self):
         return "Target('{}', limits={}, updateAfter={})".format(self.target, self.limits, self.update_after)
 
     def get_target(self):
-        return self._config['target']
+        return self._target
 
     def get_limits(self):
-        return tuple(self._config['limits'])
+        return self._limits
 
     def set_limits(self, new_limits):
+        self._limits = tuple(new_limits)
         self._config['limits'] = new_limits
 
     def get_update_after(self):
-        try:
-            return self._config['updateAfter']
-        except KeyError:
-            return False
+        return self._update_after
 
     target = property(get_target)
     limits = property(get_limits, set_limits)
@@ -45,6 +51,7 @@ class State:
         self._name = name
         self._config = config
         self._targets = {device: Target(target) for device, target in config.get('targets', {}).items()}
+        self._limits = {device: target.limits for device, target in self._targets.items()}
 
     def __repr__(self):
         return "State({}[{}], targets={})".format(self.name, self.fullname, self.targets)
@@ -58,18 +65,37 @@ class State:
     def get_targets(self):
         return self._targets
 
+    def get_limits(self):
+        return self._limits
+
+    def set_target_limits(self, device, limits):
+        """
+        Sets new limits to the target of a Device in this State.
+        :param device: str
+            The name of the device
+        :param limits: (float, float)
+            The new (low, high) limits
+        """
+        target = self._targets[device]
+        target.limits = limits
+        self._limits[device] = target.limits
+
     name = property(get_name)
     fullname = property(get_fullname)
     targets = property(get_targets)
+    limits = property(get_limits)
 
 device_types_registry = {}
+device_types_registry_keys = ()
 
 
 class MetaDevice(type):
     """ Automatic registry for new Device types """
     def __new__(meta, name, bases, class_dict):
+        global device_types_registry_keys
         cls = type.__new__(meta,  name, bases, class_dict)
         device_types_registry[cls.__name__] = cls
+        device_types_registry_keys = tuple(device_types_registry)
         return cls
 
 
@@ -78,15 +104,27 @@ class Device(metaclass=MetaDevice):
     Base class for all Device types. Actual devices of the type 'Device' act like dummies: all moves complete
     immediately and successfully, no hardware is touched.
     """
-    REQUIRED_FIELDS = ('name', 'timeout')
+    REQUIRED_FIELDS = frozenset(('name', 'timeout'))
+    # Whether this device type checks its position against the limits of its target
+    MONITORS_LIMITS = False
 
     def __init__(self, name, config, governor, logger_name="Device"):
         self._name = name
         self._config = config
-        self._governor = governor
+        # Devices must not keep their Governor alive
+        self._governor = weakref.proxy(governor)
         self._limits = None
         self._target = None
+        self._target_pos = None
+        # (target position, lower, upper) absolute limits of the current target, or None when they are not checked.
+        # Always replaced as a whole, so that monitor callbacks never see a partially updated target
+        self._limits_check = None
+        # The limits check for which a violation was already reported
+        self._violation_reported = None
+        # Lock to keep concurrent updates of the target from publishing the limits check of an outdated target
+        self._target_lock = Lock()
         self._homed = False
+        self._positions = dict(config.get('positions', {}))
 
         self._logger_name = "{}.{}[{}]".format(governor.logger_name, logger_name, name)
         self._logger = logging.getLogger(self._logger_name)
@@ -94,6 +132,13 @@ class Device(metaclass=MetaDevice):
     def __repr__(self):
         return "Device({}[{}], pv='{}' positions={})".format(self.name, self.fullname, self.pvname, self.positions)
 
+    def _device_event(self, event, device=None):
+        """ Emits an event to the Governor, unless it no longer exists. """
+        try:
+            self._governor.device_event(event, device)
+        except ReferenceError:
+            pass
+
     def move(self, target, wait=False):
         """
         Moves this Device to the desired target position.
@@ -119,6 +164,13 @@ class Device(metaclass=MetaDevice):
         """ Immediately stops the motion """
         self._logger.info("Issued STOP")
 
+    def status_tuple(self):
+        """
+        Returns this Device's status from cached values only, without any Channel Access round-trip.
+        :return: (connected, alarmed, homed) tuple of bools
+        """
+        return self.connected, self.alarmed, self.homed
+
     @property
     def connected(self):
         return True
@@ -149,7 +201,19 @@ class Device(metaclass=MetaDevice):
 
     @property
     def positions(self):
-        return self._config.get('positions', {})
+        return self._positions
+
+    def set_position(self, position, value):
+        """
+        Sets a new value to one of this Device's positions, both in its configuration and in its cached positions.
+        :param position: str
+            The name of the position
+        :param value: float
+            The new value for the position
+        """
+        self._config.setdefault('positions', {})[position] = value
+        self._positions[position] = value
+        self.update_target()
 
     @property
     def target(self):
@@ -159,12 +223,31 @@ class Device(metaclass=MetaDevice):
     def target(self, target):
         self._logger.info("Target set to %s", target)
         self._target = target
+        self.update_target()
+
+    def update_target(self):
+        """
+        Recomputes the position and the absolute limits of the current target. Must be called whenever the target, or
+        the position or the limits of the current target change. Every change of the target is followed by a call, and
+        calls are serialized, so the last one to finish always publishes the limits of the latest target.
+        """
+        with self._target_lock:
+            target = self._target
+            if target is None:
+                self._limits_check = None
+                self._target_pos = None
+                return
+
+            target_pos = self.positions.get(target.target, target.target)
+            self._target_pos = target_pos
+            if self.MONITORS_LIMITS:
+                lower, upper = target.limits
+                tolerance = self.tolerance
+                self._limits_check = (target_pos, target_pos + lower - tolerance, target_pos + upper + tolerance)
 
     @property
     def target_pos(self):
-        if self.target is None:
-            return None
-        return self.positions.get(self._target.target, self._target.target)
+        return self._target_pos
 
     @property
     def limits(self):
@@ -174,6 +257,10 @@ class Device(metaclass=MetaDevice):
     def timeout(self):
         return self._config['timeout']
 
+    @property
+    def tolerance(self):
+        return 0
+
     @property
     def val(self):
         return self.target_pos
@@ -181,14 +268,26 @@ class Device(metaclass=MetaDevice):
 
 class Motor(Device):
     """ A Motor device that represents a real motor. It communicates with an EPICS motor record. """
-    REQUIRED_FIELDS = Device.REQUIRED_FIELDS + ('pv', 'tolerance', 'positions')
+    REQUIRED_FIELDS = Device.REQUIRED_FIELDS | {'pv', 'tolerance', 'positions'}
+    MONITORS_LIMITS = True
 
     def __init__(self, name, config, governor):
         super(Motor, self).__init__(name, config, governor, logger_name="Motor")
 
+        # Latest DMOV value and an Event that is set while it is 1 (motor not moving), both updated by its monitor
+        self._dmov_value = None
+        self._done_event = Event()
+        # Homing status from MSTA. None until its first update, so that an initial 'not homed' is still logged
+        self._homed = None
+        # Latest readback value, as updated by its monitor
+        self._rbv_value = None
+        # Connection status, as updated by the connection callback
+        self._connected = False
+
         self._val = epics.PV(self.pvname, connection_callback=self._connection_changed)
-        self._rbv = epics.PV(self.pvname + ".RBV", callback=self._value_changed)
-        self._dmov = epics.PV(self.pvname + ".DMOV")
+        # RBV updates at a high rate while moving: only subscribe to value changes (no alarm/log events)
+        self._rbv = epics.PV(self.pvname + ".RBV", callback=self._value_changed, auto_monitor=epics.dbr.DBE_VALUE)
+        self._dmov = epics.PV(self.pvname + ".DMOV", callback=self._dmov_changed)
         self._msta = epics.PV(self.pvname + ".MSTA", callback=self._status_changed)
         self._stop = epics.PV(self.pvname + ".STOP")
 
@@ -197,25 +296,43 @@ class Motor(Device):
 
     def _connection_changed(self, **kwargs):
         """ Emits a disconnect event to the Governor. Called by pcaspy. """
+        self._connected = kwargs['conn']
         if not kwargs['conn']:
             self._logger.warn('disconnected')
-            self._governor.device_event(self._governor.DISCONNECT_EVENT, self)
+            self._device_event(Governor.DISCONNECT_EVENT, self)
 
     def _value_changed(self, value, **kwargs):
         """ Checks if the new value is within limits. If not, emits a limits violation event. Called by pcaspy. """
-        if self.target_pos is not None:
-            lower = self.target_pos + self.limits[0] - self.tolerance
-            upper = self.target_pos + self.limits[1] + self.tolerance
-            if value < lower or value > upper:
-                msg = "limits violated: position=%f target=%f abs limits=%s"
-                self._logger.warn(msg, value, self.target_pos, (lower, upper))
-                self._governor.device_event(self._governor.LIMITS_VIOLATED_EVENT, self)
+        self._rbv_value = value
+
+        # Unmonitored while moving or outside a state: nothing to check
+        check = self._limits_check
+        if check is None:
+            return
+
+        # Report a violation only once per target: the Governor drops the target when handling it
+        target_pos, lower, upper = check
+        if (value < lower or value > upper) and check is not self._violation_reported:
+            self._violation_reported = check
+            msg = "limits violated: position=%f target=%f abs limits=%s"
+            self._logger.warn(msg, value, target_pos, (lower, upper))
+            self._device_event(Governor.LIMITS_VIOLATED_EVENT, self)
+
+    def _dmov_changed(self, value, **kwargs):
+        """ Keeps track of whether the motor is done moving. Called by pyepics. """
+        self._dmov_value = value
+        if value:
+            self._done_event.set()
+        else:
+            self._done_event.clear()
 
     def _status_changed(self, value, **kwargs):
-        """ Checks if the homing status changed. """
-        self._homed = bool(int(value) & 0x4000)
-        if not self._homed:
-            self._logger.error("not homed")
+        """ Checks if the homing status changed. Only logs when the motor becomes not homed. """
+        homed = (int(value) & 0x4000) != 0
+        if homed != self._homed:
+            self._homed = homed
+            if not homed:
+                self._logger.error("not homed")
 
     def move(self, target, wait=False):
         """
@@ -229,7 +346,13 @@ class Motor(Device):
         self.target = None
         target_pos = self.positions.get(target.target, target.target)
         self._logger.info("Issued move to '%s' (%f)", target, target_pos)
-        self._val.put(target_pos)
+        self._done_event.clear()
+
+        # pyepics returns None when the put couldn't be sent. DMOV would then never toggle: fail right away
+        if self._val.put(target_pos) is None:
+            self._logger.error("Couldn't issue move to '%s': not connected", target)
+            self._device_event(Governor.DISCONNECT_EVENT, self)
+            return False
         return self.wait() if wait else True
 
     def wait(self):
@@ -237,16 +360,19 @@ class Motor(Device):
         Waits for the motor to finish moving
         :return: True if the move was successful, False otherwise
         """
-        start_pos = self._rbv.get()
-        start = time.time()
+        start_pos = self._rbv_value
         self._logger.info("Waiting movement completion")
-        time.sleep(0.1)
-        while not self.done:
-            if time.time() - start > self.timeout and self._rbv.get() == start_pos:
-                self._governor.device_event(self._governor.TIMEOUT_EVENT)
+
+        # A move to the current position might not toggle DMOV: give the motor a chance to start moving first
+        if not self._done_event.wait(0.1) and self.done:
+            return True
+
+        # Keep waiting while the motor is still making progress
+        while not self._done_event.wait(self.timeout):
+            if self._rbv_value == start_pos:
+                self._device_event(Governor.TIMEOUT_EVENT)
                 self._logger.warn("Movement timed out")
                 return False
-            time.sleep(0.1)
         return True
 
     def stop(self):
@@ -260,7 +386,7 @@ class Motor(Device):
 
     @property
     def connected(self):
-        return self._val.wait_for_connection(0)
+        return self._connected
 
     @property
     def homed(self):
@@ -268,13 +394,13 @@ class Motor(Device):
 
     @property
     def done(self):
-        return bool(self._dmov.get())
+        return bool(self._dmov_value)
 
     @Device.target.setter
     def target(self, target):
         Device.target.fset(self, target)
-        if target is not None:
-            self._value_changed(value=self._rbv.get())
+        if target is not None and self._rbv_value is not None:
+            self._value_changed(value=self._rbv_value)
 
     @property
     def val(self):
@@ -290,13 +416,22 @@ class Valve(Device):
 
     It has two implicit positions: Open and Closed.
     """
-    REQUIRED_FIELDS = Device.REQUIRED_FIELDS + ('pv', )
+    REQUIRED_FIELDS = Device.REQUIRED_FIELDS | {'pv'}
+    MONITORS_LIMITS = True
     TGT_OPEN = "Open"
     TGT_CLOSED = "Closed"
     TGTS = [TGT_CLOSED, TGT_OPEN]
 
     def __init__(self, name, config, governor):
         super(Valve, self).__init__(name, config, governor, logger_name="Valve")
+        self._positions = {self.TGT_OPEN: 1, self.TGT_CLOSED: 0}
+
+        # Latest position, as updated by its monitor, and an Event that is set once it reaches the current setpoint
+        self._value = None
+        self._done_event = Event()
+        self._current_setpoint = None
+        # Connection status, as updated by the connection callback
+        self._connected = False
 
         self._val = epics.PV(self.pvname + "Pos-Sts",
                              connection_callback=self._connection_changed,
@@ -304,26 +439,32 @@ class Valve(Device):
         self._open = epics.PV(self.pvname + "Cmd:Opn-Cmd")
         self._close = epics.PV(self.pvname + "Cmd:Cls-Cmd")
 
-        self._current_setpoint = self.val
+        self._current_setpoint = self._val.get()
 
     def __repr__(self):
         return "Valve({}[{}], pv='{}' positions={})".format(self.name, self.fullname, self.pvname, self.positions)
 
     def _connection_changed(self, **kwargs):
         """ Emits a disconnect event to the Governor. Called by pcaspy. """
+        self._connected = kwargs['conn']
         if not kwargs['conn']:
             self._logger.warn('disconnected')
-            self._governor.device_event(self._governor.DISCONNECT_EVENT, self)
+            self._device_event(Governor.DISCONNECT_EVENT, self)
 
     def _value_changed(self, value, **kwargs):
         """ Checks if the new value is still the expected position. If not, emits a limits violation event. """
-        if self.target_pos is not None:
-            lower = self.target_pos + self.limits[0]
-            upper = self.target_pos + self.limits[1]
-            if value < lower or value > upper:
+        self._value = value
+        if value == self._current_setpoint:
+            self._done_event.set()
+
+        check = self._limits_check
+        if check is not None:
+            target_pos, lower, upper = check
+            if (value < lower or value > upper) and check is not self._violation_reported:
+                self._violation_reported = check
                 msg = "position violated: position=%s target=%s"
-                self._logger.warn(msg, self.TGTS[value], self.TGTS[self.target_pos])
-                self._governor.device_event(self._governor.LIMITS_VIOLATED_EVENT, self)
+                self._logger.warn(msg, self.TGTS[value], self.TGTS[target_pos])
+                self._device_event(Governor.LIMITS_VIOLATED_EVENT, self)
 
     def move(self, target, wait=False):
         """
@@ -337,13 +478,19 @@ class Valve(Device):
         self.target = None
         target_pos = self.positions.get(target.target, target.target)
         self._logger.info("Issued move to '%s' (%s)", target, target_pos)
+        if target.target not in (self.TGT_OPEN, self.TGT_CLOSED):
+            raise ValueError("Invalid target {}".format(target.target))
+
+        self._done_event.clear()
+        self._current_setpoint = target_pos
         if target.target == self.TGT_OPEN:
             self._open.put(1)
-        elif target.target == self.TGT_CLOSED:
-            self._close.put(1)
         else:
-            raise ValueError("Invalid target {}".format(target.target))
-        self._current_setpoint = target_pos
+            self._close.put(1)
+
+        # The valve might already be there, in which case its position won't change
+        if self.done:
+            self._done_event.set()
 
         return self.wait() if wait else True
 
@@ -352,27 +499,22 @@ class Valve(Device):
         Waits for the valve to reach the desired position.
         :return: True if the move was successful, False otherwise
         """
-        start = time.time()
         self._logger.info("Waiting movement completion. Timeout=%.2f", self.timeout)
-        time.sleep(0.1)
-        while not self.done:
-            if time.time() - start > self.timeout:
-                self._governor.device_event(self._governor.TIMEOUT_EVENT)
-                self._logger.warn("Movement timed out")
-                return False
-            time.sleep(0.1)
+        if not self._done_event.wait(self.timeout):
+            self._device_event(Governor.TIMEOUT_EVENT)
+            self._logger.warn("Movement timed out")
+            return False
         return True
 
     def stop(self):
         self._logger.info("Issued STOP (nothing to do)")
 
-    @property
-    def positions(self):
-        return {self.TGT_OPEN: 1, self.TGT_CLOSED: 0}
+    def set_position(self, position, value):
+        self._logger.warning("Won't set position '%s' to '%s': valve positions are fixed", position, value)
 
     @property
     def connected(self):
-        return self._val.wait_for_connection(0)
+        return self._connected
 
     @property
     def done(self):
@@ -381,13 +523,31 @@ class Valve(Device):
     @Device.target.setter
     def target(self, target):
         Device.target.fset(self, target)
-        if target is not None:
-            #raise ValueError
-            self._value_changed(value=self._val.get())
+        if target is not None and self._value is not None:
+            self._value_changed(value=self._value)
 
     @property
     def val(self):
-        return self._val.get()
+        return self._value
+
+
+class StateSnapshot:
+    """ The operating state of a State, as seen by the Governor's observer. """
+    __slots__ = ('active', 'reachable', 'limits')
+
+    def __init__(self, limits):
+        self.active = False
+        self.reachable = False
+        self.limits = limits
+
+
+class TransitionSnapshot:
+    """ The operating state of a Transition, as seen by the Governor's observer. """
+    __slots__ = ('active', 'reachable')
+
+    def __init__(self):
+        self.active = False
+        self.reachable = False
 
 
 class Governor:
@@ -396,6 +556,8 @@ class Governor:
     LIMITS_VIOLATED_EVENT = 'limits_violated'
     TIMEOUT_EVENT = 'timeout'
     ABORT_EVENT = 'abort'
+    # Events that abort the current transition and put the Governor back in its initial state
+    FAULT_EVENTS = frozenset((DISCONNECT_EVENT, ALARM_EVENT, LIMITS_VIOLATED_EVENT, TIMEOUT_EVENT, ABORT_EVENT))
     LIMIT_LOW = 0
     LIMIT_HIGH = 1
 
@@ -404,16 +566,28 @@ class Governor:
     STATUS_DISABLED = 2
     STATUS_FAULT = 3
 
+    # Minimum period between notifications to the observer, in seconds
+    NOTIFY_PERIOD = 0.1
+    # Period between fault state checks, in seconds
+    FAULT_CHECK_PERIOD = 0.5
+    # Time to wait for more configuration changes before writing them back to the file, in seconds
+    COMMIT_DELAY = 0.1
+
     def __init__(self, name, config):
         self._name = name
         self._logger_name = "Governor[{}]".format(self.name)
         self._logger = logging.getLogger(self._logger_name)
         self._observer = None
-        self._status = self.STATUS_IDLE
+        self._dirty = Event()
+        # Lock to keep the notifier thread and a flush from a transition from updating the snapshots at the same time
+        self._notify_lock = Lock()
         self._disconnected_devices = []
         self._alarmed_devices = []
         self._not_homed_devices = []
-        self._current_state = None
+        # (state, status, enabled). The only record of the current state and status: it is replaced as a whole, under
+        # _state_lock, so that readers always get a consistent view without locking
+        self._state_view = (None, self.STATUS_IDLE, True)
+        self._state_lock = Lock()
         self._next_state = None
         self._init_state = None
         self._devices = {}
@@ -421,17 +595,30 @@ class Governor:
         self._transitions = {}
         self._config = config
         self._parse_config(config)
-        self._queue = Queue()
+        self._events = deque()
+        self._events_cond = Condition()
         self._abort_transition = False
         self._busy = False
         self.set_state(self._init_state)
         self._running = True
 
+        # Pool to move and wait for the devices of a parallel group concurrently
+        self._pool = ThreadPoolExecutor(max_workers=max(len(self._devices), 1))
         # Lock to prevent multiple transitions from happening at once
         self._worker_lock = Lock()
+        # Lock to prevent changes to the configuration while it is being written back to its file
+        self._config_lock = Lock()
+        # Queue of pending configuration commits. None stops the committer thread
+        self._commit_queue = Queue()
         # Thread to deal with events
         self._worker_thread = Thread(target=self._worker)
         self._worker_thread.start()
+        # Thread to coalesce notifications to the observer
+        self._notifier_thread = Thread(target=self._notifier)
+        self._notifier_thread.start()
+        # Thread to write configuration changes back to the file
+        self._committer_thread = Thread(target=self._committer)
+        self._committer_thread.start()
         self._logger.info("created")
 
     @property
@@ -440,19 +627,19 @@ class Governor:
 
     @property
     def state(self):
-        return self._current_state
+        return self._state_view[0]
 
     @property
     def idle(self):
-        return self._status == self.STATUS_IDLE
+        return self._state_view[1] == self.STATUS_IDLE
 
     @property
     def busy(self):
-        return self._status == self.STATUS_BUSY
+        return self._state_view[1] == self.STATUS_BUSY
 
     @property
     def fault(self):
-        return self._status == self.STATUS_FAULT
+        return self._state_view[1] == self.STATUS_FAULT
 
     @property
     def logger_name(self):
@@ -460,7 +647,30 @@ class Governor:
 
     @property
     def enabled(self):
-        return self.status != self.STATUS_DISABLED
+        return self._state_view[2]
+
+    def state_view(self):
+        """
+        Returns a consistent view of the Governor's current state and status.
+        :return: (state, status, enabled) tuple
+        """
+        return self._state_view
+
+    def _set_status(self, status, expected=None):
+        """
+        Sets the Governor's status.
+        :param status: int
+            The new status, one of the STATUS_* values
+        :param expected: int
+            If given, the status is only changed if it currently is this one. Default: None
+        :return: True if the status was changed, False otherwise
+        """
+        with self._state_lock:
+            state, current_status, enabled = self._state_view
+            if expected is not None and current_status != expected:
+                return False
+            self._state_view = (state, status, status != self.STATUS_DISABLED)
+            return True
 
     @property
     def observer(self):
@@ -485,12 +695,13 @@ class Governor:
 
     @property
     def status(self):
-        return self._status
+        return self._state_view[1]
 
     @property
     def status_message(self):
         """ Build the status message string and returns it. """
-        if self.fault:
+        state, status, enabled = self._state_view
+        if status == self.STATUS_FAULT:
             disconn = ("disconn", self._disconnected_devices)
             alarmed = ("alarm", self._alarmed_devices)
             not_homed = ("!homed", self._not_homed_devices)
@@ -501,13 +712,17 @@ class Governor:
                     err.append("{}({})".format(name, ",".join(device_list)))
 
             return " ".join(err)
-        elif self._next_state == self._current_state:
-            return "state {}".format(self._current_state)
+        elif self._next_state == state:
+            return "state {}".format(state)
         else:
-            return "transition {} to {}".format(self._current_state, self._next_state)
+            return "transition {} to {}".format(state, self._next_state)
 
     def kill(self):
         self._running = False
+        self._commit_queue.put(None)
+        with self._events_cond:
+            self._events_cond.notify()
+        self._pool.shutdown(wait=False)
 
     def abort(self):
         """ Put an abort event on the events queue. Called by GovernorDriver when an abort command is received. """
@@ -529,41 +744,80 @@ class Governor:
             self._logger.warn("Can't change enabled state while busy")
             return False
 
-        if enabled:
-            self._status = self.STATUS_IDLE
-        else:
-            self._status = self.STATUS_DISABLED
+        self._set_status(self.STATUS_IDLE if enabled else self.STATUS_DISABLED)
 
         self.set_state(self._init_state)
         self._notify_observer()
         return True
 
     def _notify_observer(self):
+        """ Schedules a notification to the pcaspy server. Notifications are coalesced by the notifier thread. """
+        self._dirty.set()
+
+    def _committer(self):
+        """
+        Runs in a separate thread. Writes configuration changes back to the file, so that callers never block on disk
+        I/O. Changes made within COMMIT_DELAY of each other are written at once.
+        """
+        running = True
+        while running:
+            requests = [self._commit_queue.get()]
+            time.sleep(self.COMMIT_DELAY)
+            try:
+                while True:
+                    requests.append(self._commit_queue.get_nowait())
+            except Empty:
+                pass
+
+            running = None not in requests
+            if any(requests):
+                try:
+                    with self._config_lock:
+                        self._config.commit()
+                except Exception as e:
+                    self._logger.exception("Exception while committing configuration: %s", e)
+
+    def _notifier(self):
+        """ Runs in a separate thread. Notifies the observer at most every NOTIFY_PERIOD seconds. """
+        while self._running:
+            if not self._dirty.wait(0.5):
+                continue
+            time.sleep(self.NOTIFY_PERIOD)
+            self._flush_notifications()
+
+    def _flush_notifications(self):
+        """ Notifies the observer right away of any pending change, instead of waiting for the notifier thread. """
+        self._dirty.clear()
+        try:
+            with self._notify_lock:
+                self._do_notify_observer()
+        except Exception as e:
+            self._logger.exception("Exception while notifying observer: %s", e)
+
+    def _do_notify_observer(self):
         """ Notify the pcaspy server that the PVs have new values. """
         if self._observer is None:
             return
 
-        states = {}
-        for state_name, state in self._states.items():
-            states[state_name] = {
-                "active": state_name == self._current_state,
-                "reachable": state_name in self.reachable_states() and self.enabled and self.idle,
-                "limits": {dev_name: target.limits for dev_name, target in state.targets.items()}
-            }
+        # Active and reachable flags only depend on these: skip recomputing them if none changed
+        current_state, status, enabled = self.state_view()
+        idle = enabled and status == self.STATUS_IDLE
+        snapshot_key = (current_state, self._next_state, idle)
+        if snapshot_key != self._snapshot_key:
+            self._snapshot_key = snapshot_key
+            reachable = self._reachable[current_state] if idle else frozenset()
 
-        transitions = {}
-        for origin in self._transitions:
-            for dest in self._transitions[origin]:
-                transitions[(origin, dest)] = (
-                    # Active
-                    (origin, dest) == (self._current_state, self._next_state),
-                    # Reachable
-                    origin == self._current_state and dest in self.reachable_states() and self.enabled and self.idle
-                )
+            for state_name, state_snapshot in self._states_snapshot.items():
+                state_snapshot.active = state_name == current_state
+                state_snapshot.reachable = state_name in reachable
 
-        devices = {dev_name: copy.copy(dev.positions) for dev_name, dev in self._devices.items()}
+            active_transition = (current_state, self._next_state)
+            for transition, transition_snapshot in self._transitions_snapshot.items():
+                origin, dest = transition
+                transition_snapshot.active = transition == active_transition
+                transition_snapshot.reachable = origin == current_state and dest in reachable
 
-        self._observer.update(self.name, states, transitions, devices)
+        self._observer.update(self.name, self._states_snapshot, self._transitions_snapshot, self._devices_snapshot)
 
     def device_event(self, event, device=None):
         """
@@ -574,7 +828,9 @@ class Governor:
         :param device: str
             The source of the event. Default: None
         """
-        self._queue.put((event, device))
+        with self._events_cond:
+            self._events.append((event, device))
+            self._events_cond.notify()
 
     def set_state(self, state, force=False):
         """
@@ -586,8 +842,13 @@ class Governor:
             Whether to force going to the new state. Default: False
         :return:
         """
-        if self._current_state != state or force:
-            self._current_state = state
+        with self._state_lock:
+            state_view = self._state_view
+            changed = state_view[0] != state or force
+            if changed:
+                self._state_view = (state,) + state_view[1:]
+
+        if changed:
             self._next_state = state
             if state == self._init_state:
                 for device in self._devices.values():
@@ -596,7 +857,8 @@ class Governor:
 
     def set_state_device_limit(self, state, device, limit, value):
         """
-        Set a new limit value to a State's Device's limit. The new value is written back to the configuration file.
+        Set a new limit value to a State's Device's limit. The new value is written back to the configuration file in
+        the background.
 
         :param state: str
             The name of the state
@@ -619,13 +881,16 @@ class Governor:
             self._logger.error(msg, state, device, new_limits)
             return False
 
-        self._states[state].targets[device].limits = new_limits
-        self._config.commit()
+        with self._config_lock:
+            self._states[state].set_target_limits(device, new_limits)
+        self._devices[device].update_target()
+        self._commit_queue.put(True)
         return True
 
     def set_device_position(self, device, position, value):
         """
-        Set a new position value to a Device's position. The new value is written back to the configuration file.
+        Set a new position value to a Device's position. The new value is written back to the configuration file in the
+        background.
 
         :param device: str
             The name of the device
@@ -637,8 +902,9 @@ class Governor:
         """
         if value is not None:
             self._logger.info("Setting device '%s' position '%s' to value '%s'", device, position, value)
-            self._devices[device].positions[position] = value
-            self._config.commit()
+            with self._config_lock:
+                self._devices[device].set_position(position, value)
+            self._commit_queue.put(True)
         else:
             msg = "Won't set device '%s' position '%s' to None. Ensure '%s' participates in the transition sequence"
             self._logger.warning(msg, device, position, device)
@@ -671,16 +937,55 @@ class Governor:
             for destination, sequence in transition.items():
                 self._transitions[origin][destination] = sequence
 
+        # Reachable states and (origin, destination) pairs never change after parsing
+        self._reachable = {origin: frozenset((origin,) + tuple(dests)) for origin, dests in self._transitions.items()}
+        self._transition_pairs = tuple((origin, dest) for origin, dests in self._transitions.items() for dest in dests)
+
+        # Snapshots handed to the observer. They are updated in place as the Governor changes
+        self._states_snapshot = {name: StateSnapshot(state.limits) for name, state in self._states.items()}
+        self._transitions_snapshot = {transition: TransitionSnapshot() for transition in self._transition_pairs}
+        # Read-only views of the live device positions: no copies are needed when positions change
+        self._devices_snapshot = {name: MappingProxyType(device.positions) for name, device in self._devices.items()}
+        self._snapshot_key = None
+
     def reachable_states(self, origin=None):
         """
-        Returns a list of reachable states from a certain origin, or from the current state if origin is None
+        Returns the set of reachable states from a certain origin, or from the current state if origin is None
         :param origin: str
             Name of the state to get from which to get the other reachable states.
-        :return: A list of state names that are reachable from origin
+        :return: A frozenset of state names that are reachable from origin
         """
         if origin is None:
-            origin = self._current_state
-        return (origin,) + tuple(self._transitions[origin].keys())
+            origin = self.state
+        return self._reachable[origin]
+
+    def _run_concurrently(self, calls):
+        """
+        Runs calls on the thread pool and waits for all of them to finish.
+        :param calls: list
+            A list of (function, arg1, arg2, ...) tuples
+        :return: list of the results, in the same order as the calls. Once all calls finished, the first exception
+            raised by a call, if any, is re-raised.
+        """
+        futures = [self._pool.submit(*call) for call in calls]
+        wait(futures)
+        return [future.result() for future in futures]
+
+    def _move_concurrently(self, devices):
+        """
+        Starts moving several devices at once. Motor puts don't block, so they are issued one after the other from the
+        calling thread, other devices are moved on the thread pool.
+        :param devices: list
+            A list of (Device, Target) tuples
+        """
+        others = []
+        for device, target in devices:
+            if isinstance(device, Motor):
+                device.move(target)
+            else:
+                others.append((device.move, target))
+
+        self._run_concurrently(others)
 
     def _do_transition(self, dest):
         """
@@ -689,7 +994,7 @@ class Governor:
             The destination state.
         """
 
-        origin = self._current_state
+        origin = self.state
 
         if not self.enabled:
             msg = "attempted transition [%s]->[%s] while disabled"
@@ -736,14 +1041,21 @@ class Governor:
             else:
                 devices = [(self._devices[i], targets[i]) for i in item]
 
-            for device, target in devices:
+            if len(devices) == 1:
+                device, target = devices[0]
                 moved_devices.add(device.name)
                 if not self._abort_transition:
                     device.move(target)
-
-            for device, target in devices:
                 if not self._abort_transition:
                     device.wait()
+            else:
+                moved_devices.update(device.name for device, target in devices)
+                if not self._abort_transition:
+                    self._move_concurrently(devices)
+                if not self._abort_transition:
+                    self._run_concurrently([(device.wait,) for device, target in devices])
+
+            for device, target in devices:
                 if not self._abort_transition:
                     device.target = target
 
@@ -761,7 +1073,7 @@ class Governor:
         with self._worker_lock:
             start_time = time.time()
 
-            self._status = self.STATUS_BUSY
+            self._set_status(self.STATUS_BUSY)
             self._notify_observer()
 
             self._abort_transition = False
@@ -771,45 +1083,61 @@ class Governor:
             except Exception as e:
                 self._logger.exception("Exception during transition: %s", e)
 
-            if self._status == self.STATUS_BUSY:
-                self._status = self.STATUS_IDLE
+            self._set_status(self.STATUS_IDLE, expected=self.STATUS_BUSY)
 
             self._abort_transition = False
-            self._notify_observer()
+            # The final state must reach the observer before the caller learns that the transition is over
+            self._flush_notifications()
 
             self._logger.debug("Transition took %.3f seconds", time.time() - start_time)
 
     def check_fault_state(self):
         """ Checks if still in fault state """
-        self._disconnected_devices = [d for d in self._devices if not self._devices[d].connected]
-        self._alarmed_devices = [d for d in self._devices if self._devices[d].alarmed]
-        self._not_homed_devices = [d for d in self._devices if not self._devices[d].homed]
+        disconnected, alarmed, not_homed = [], [], []
+        disconnected_append, alarmed_append, not_homed_append = disconnected.append, alarmed.append, not_homed.append
+        for name, device in self._devices.items():
+            is_connected, is_alarmed, is_homed = device.status_tuple()
+            # The cached alarm and homing status of a disconnected device are stale
+            if not is_connected:
+                disconnected_append(name)
+                continue
+            if is_alarmed:
+                alarmed_append(name)
+            if not is_homed:
+                not_homed_append(name)
+
+        self._disconnected_devices = disconnected
+        self._alarmed_devices = alarmed
+        self._not_homed_devices = not_homed
 
         if self.enabled:
             if any((self._disconnected_devices, self._alarmed_devices, self._not_homed_devices)):
-                self._status = self.STATUS_FAULT
+                self._set_status(self.STATUS_FAULT)
                 self.set_state(self._init_state)
-            elif self.fault:
-                self._status = self.STATUS_IDLE
+            elif self._set_status(self.STATUS_IDLE, expected=self.STATUS_FAULT):
                 self.set_state(self._init_state)
 
     def _worker(self):
         """ Runs in a separate thread. Deals with events coming from the Devices or from an abort command."""
+        next_check = time.monotonic() + self.FAULT_CHECK_PERIOD
         while self._running:
-            try:
-                message = self._queue.get(timeout=0.5)
-            except Empty:
-                # No messages, check if we're in a fault state
-                self.check_fault_state()
-                continue
+            # Wait for events or for the next fault state check, then take all pending events at once
+            with self._events_cond:
+                timeout = max(next_check - time.monotonic(), 0)
+                self._events_cond.wait_for(lambda: self._events or not self._running, timeout)
+                events = {event for event, device in self._events}
+                self._events.clear()
 
             # A device disconnected, major alarmed, moved out of limits or timed out: go to fault state
-            event, device = message
-            if event in (self.DISCONNECT_EVENT, self.ALARM_EVENT, self.LIMITS_VIOLATED_EVENT, self.TIMEOUT_EVENT,
-                         self.ABORT_EVENT):
+            if events & self.FAULT_EVENTS:
                 self._abort_transition = True
                 self.set_state(self._init_state, force=True)
-                if event == self.ABORT_EVENT:
+                if self.ABORT_EVENT in events:
                     for dev in self.devices.values():
                         dev.stop()
-                self.check_fault_state()
+            elif time.monotonic() < next_check:
+                continue
+
+            # Check if we're in a fault state
+            self.check_fault_state()
+            next_check = time.monotonic() + self.FAULT_CHECK_PERIOD
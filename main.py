@@ -1,10 +1,8 @@
 import argparse
 import logging
-import re
 import time
-from threading import Thread
-from queue import Queue
-from collections import OrderedDict
+from threading import Thread, Lock, Event
+from collections import OrderedDict, deque
 from functools import partial
 
 from pcaspy import SimpleServer, Driver, Severity
@@ -20,6 +18,9 @@ class GovernorDriver(Driver):
     The GovernorDriver deals with EPICS requests. It manages different "governors" (only one "governor" is active at
     any given time) and routes the requests to the appropriate governor.
     """
+    # Minimum period between PV updates, in seconds
+    FLUSH_PERIOD = 0.05
+
     def __init__(self, governors, active_governor, sync_targets={}):
         """
         :param governors: list of Governor:
@@ -36,13 +37,33 @@ class GovernorDriver(Driver):
         # Internal state
         self._active = True
         self._governors = governors
+        self._gov_names = tuple(governors.keys())
         self._active_governor = active_governor
+        self._active_idx = self._gov_names.index(active_governor)
         self._sync_targets = sync_targets
         self._logger = logging.getLogger("GovernorDriver")
+        # Latest update of each governor that was not applied yet
+        self._pending = {}
+        self._pending_lock = Lock()
+        self._pending_event = Event()
+        # Lock to keep the flusher and worker threads from applying updates at the same time
+        self._flush_lock = Lock()
+        # Last value set to each PV
+        self._last = {}
+        # Values of the latest update applied for each governor
+        self._fingerprints = {}
+        # Sorted reachable state names of each governor, by which of its transitions are reachable
+        self._reach_cache = {}
+        self._read_routes, self._write_routes = self._build_routes()
+        # Callbacks completing the asynchronous writes to each governor's Go-Cmd PV
+        self._go_callbacks = {
+            gov_name: partial(self.callbackPV, '{{Gov:{}}}Cmd:Go-Cmd'.format(gov_name)) for gov_name in governors
+        }
+        self._build_pv_names()
 
         # Initialize PV values
         self.setParam("{Gov}Active-Sel", self._active)
-        self.setParam("{Gov}Config-Sel", list(governors.keys()).index(active_governor))
+        self.setParam("{Gov}Config-Sel", self._active_idx)
         self.setParam("{Gov}Cmd:Abort-Cmd", 0)
         self.setParam("{Gov}Cmd:Kill-Cmd", 0)
         for gov_name, governor in self._governors.items():
@@ -53,88 +74,217 @@ class GovernorDriver(Driver):
             self.setParam(prefix+'Sts:Msg-Sts', governor.status_message)
 
         self._worker_task = Thread(target=self._worker)
-        self._worker_q = Queue()
+        self._worker_q = deque()
+        self._worker_event = Event()
 
         self._worker_task.start()
 
+        self._flusher_task = Thread(target=self._flusher, daemon=True)
+        self._flusher_task.start()
+
+    def _build_routes(self):
+        """
+        Builds the routing tables of all per-governor PVs. The set of PVs is fixed once the governors are created, so
+        each PV gets a handler that is specialized for it and requests are routed with a single lookup.
+
+        :return: (read_routes, write_routes) dicts of the form
+            { pv_name [str]: handler [callable] }
+            Read handlers take no arguments, write handlers take (reason, value).
+        """
+        read_routes, write_routes = {}, {}
+        for gov_name, governor in self._governors.items():
+            prefix = '{{Gov:{}}}'.format(gov_name)
+            read_routes[prefix + 'Sts:Status-Sts'] = partial(self._read_status, gov_name)
+            read_routes[prefix + 'Sts:Msg-Sts'] = partial(self._read_status_message, gov_name)
+            write_routes[prefix + 'Cmd:Abort-Cmd'] = partial(self._write_abort, gov_name=gov_name)
+            write_routes[prefix + 'Cmd:Go-Cmd'] = partial(self._write_go, gov_name=gov_name)
+
+            for dev_name, device in governor.devices.items():
+                prefix = '{{Gov:{}-Dev:{}}}'.format(gov_name, dev_name)
+                for pos_name in device.positions:
+                    write_routes['{}Pos:{}-Pos'.format(prefix, pos_name)] = partial(
+                        self._write_pos, gov_name=gov_name, dev_name=dev_name, pos_name=pos_name
+                    )
+                for state_name in governor.states:
+                    for limit in ('LLim', 'HLim'):
+                        write_routes['{}{}:{}-Pos'.format(prefix, state_name, limit)] = partial(
+                            self._write_limit, gov_name=gov_name, dev_name=dev_name, state_name=state_name, limit=limit
+                        )
+        return read_routes, write_routes
+
+    def _build_pv_names(self):
+        """ Builds the names of all PVs set by update(), so that they are not formatted again on every update. """
+        self._pv_gov = {}
+        self._pv_state = {}
+        self._pv_limits = {}
+        self._pv_transition = {}
+        self._pv_pos = {}
+        for gov_name, governor in self._governors.items():
+            self._pv_gov[gov_name] = '{{Gov:{}}}'.format(gov_name)
+
+            for state_name in governor.states:
+                prefix = '{{Gov:{}-St:{}}}'.format(gov_name, state_name)
+                self._pv_state[(gov_name, state_name)] = (prefix + 'Sts:Active-Sts', prefix + 'Sts:Reach-Sts')
+
+            for origin, destinations in governor.transitions.items():
+                for destination in destinations:
+                    prefix = '{{Gov:{}-Tr:{}-{}}}'.format(gov_name, origin, destination)
+                    self._pv_transition[(gov_name, (origin, destination))] = (
+                        prefix + 'Sts:Active-Sts', prefix + 'Sts:Reach-Sts'
+                    )
+
+            for dev_name, device in governor.devices.items():
+                prefix = '{{Gov:{}-Dev:{}}}'.format(gov_name, dev_name)
+                for state_name in governor.states:
+                    self._pv_limits[(gov_name, state_name, dev_name)] = (
+                        '{}{}:LLim-Pos'.format(prefix, state_name), '{}{}:HLim-Pos'.format(prefix, state_name)
+                    )
+                for pos_name in device.positions:
+                    self._pv_pos[(gov_name, dev_name, pos_name)] = '{}Pos:{}-Pos'.format(prefix, pos_name)
+
     def _worker(self):
         """ Handles transitions in its own thread"""
         while True:
-            cmd = self._worker_q.get()
+            self._worker_event.wait()
+            self._worker_event.clear()
 
-            # Check for poison
-            if cmd is None:
-                self._logger.info("stopping worker")
-                break
+            while self._worker_q:
+                cmd = self._worker_q.popleft()
+
+                # Check for poison
+                if cmd is None:
+                    self._logger.info("stopping worker")
+                    return
 
-            action, after = cmd
-            action()
-            after()
+                action, after = cmd
+                action()
+                # Publish the outcome of the action before completing the request
+                self._flush()
+                after()
 
     def update(self, gov_name, states, transitions, devices):
         """
         Updates all relevant PV values. This method is called by each individual Governor when there is a change in its
-        whole operating state.
+        whole operating state. Updates are applied by the flusher thread at most every FLUSH_PERIOD seconds: only the
+        latest update of each governor is applied.
 
         :param gov_name: str
             The name of the governor issuing the update
         :param states: dict
             The current operating state of all governor States. A dictionary of the form
-                {
-                    state_name [str] : {
-                        'reachable': reachable [bool],
-                        'active': active [bool],
-                        'limits': {
-                            device_name [str]: (low_limit, high_limit) [(float, float) tuple]
-                    }
-                }
+                { state_name [str] : StateSnapshot }
+            where each StateSnapshot has the attributes
+                active [bool]
+                reachable [bool]
+                limits: { device_name [str]: (low_limit, high_limit) [(float, float) tuple] }
         :param transitions: dict
             The current operating state of all governor Transitions. A dictionary of the form:
-                { (from, to) [(str, str) tuple]: (active, reachable) [(bool, bool) tuple]
+                { (from, to) [(str, str) tuple]: TransitionSnapshot }
+            where each TransitionSnapshot has the attributes
+                active [bool]
+                reachable [bool]
         :param devices: dict
             The current target values for all governor Devices. A dictionary of the form:
                 { device_name [str]: list of (target_name [str], target_value [float])
         """
-        prefix = '{{Gov:{}}}'.format(gov_name)
+        with self._pending_lock:
+            self._pending[gov_name] = (states, transitions, devices)
+        self._pending_event.set()
+
+    def _flusher(self):
+        """ Applies pending updates in its own thread """
+        while True:
+            self._pending_event.wait()
+            time.sleep(self.FLUSH_PERIOD)
+            self._pending_event.clear()
+            self._flush()
+
+    def _flush(self):
+        """ Applies all pending updates and posts them right away. """
+        with self._flush_lock:
+            with self._pending_lock:
+                pending, self._pending = self._pending, {}
+
+            try:
+                for gov_name, (states, transitions, devices) in pending.items():
+                    self._apply_update(gov_name, states, transitions, devices)
+                self.updatePVs()
+            except Exception as e:
+                self._logger.exception("Exception while updating PVs: %s", e)
+
+    def _apply_update(self, gov_name, states, transitions, devices):
+        """ Sets all PV values of a governor from an update. See update() for the arguments. """
+        busy = self._governors[gov_name].busy
+
+        # Nothing to do if no value changed since the previous update of this governor
+        fingerprint = (
+            busy,
+            tuple((state.active, state.reachable, tuple(state.limits.values())) for state in states.values()),
+            tuple((transition.active, transition.reachable) for transition in transitions.values()),
+            tuple(tuple(positions.values()) for positions in devices.values()),
+        )
+        if self._fingerprints.get(gov_name) == fingerprint:
+            return
+
+        prefix = self._pv_gov[gov_name]
+        set_param = self._set_if_changed
+        pv_state, pv_limits, pv_transition, pv_pos = self._pv_state, self._pv_limits, self._pv_transition, self._pv_pos
+
+        # Sorted list of reachable state names. It only depends on which transitions are reachable
+        reach_key = (gov_name, tuple(transition.reachable for transition in transitions.values()))
+        reachable_states = self._reach_cache.get(reach_key)
+        if reachable_states is None:
+            reachable_states = self._reach_cache[reach_key] = sorted({
+                state_to
+                for (_, state_to), transition in transitions.items()
+                if transition.reachable
+            })
+        set_param(prefix + 'Sts:Reach-I', reachable_states)
 
-        # Sorted list of reachable state names
-        self.setParam(prefix + 'Sts:Reach-I', sorted(list(set(
-            state_to
-            for (_, state_to), (_, reachable) in transitions.items()
-            if reachable
-        ))))
+        set_param(prefix + 'Sts:Busy-Sts', busy)
 
         # All active states (there should be only one, pick first)
-        self.setParam(prefix + 'Sts:State-I', next((
-            state_name
-            for state_name, state_data in states.items()
-            if state_data['active']
-        ), ''))
+        active_state = ''
+        for state_name, state_updates in states.items():
+            active = state_updates.active
+            if active and not active_state:
+                active_state = state_name
 
-        self.setParam(prefix + 'Sts:Busy-Sts', self._governors[gov_name].busy)
+            active_param, reach_param = pv_state[(gov_name, state_name)]
+            set_param(active_param, active)
+            set_param(reach_param, state_updates.reachable)
 
-        for state_name, state_updates in states.items():
-            prefix = '{{Gov:{}-St:{}}}'.format(gov_name, state_name)
-            self.setParam(prefix + 'Sts:Active-Sts', state_updates["active"])
-            self.setParam(prefix + 'Sts:Reach-Sts', state_updates["reachable"])
+            for device_name, (low_lim, high_lim) in state_updates.limits.items():
+                low_param, high_param = pv_limits[(gov_name, state_name, device_name)]
+                set_param(low_param, low_lim)
+                set_param(high_param, high_lim)
 
-            for device_name, (low_lim, high_lim) in state_updates["limits"].items():
-                low_param = '{{Gov:{}-Dev:{}}}{}:LLim-Pos'.format(gov_name, device_name, state_name)
-                high_param = '{{Gov:{}-Dev:{}}}{}:HLim-Pos'.format(gov_name, device_name, state_name)
-                self.setParam(low_param, low_lim)
-                self.setParam(high_param, high_lim)
+        set_param(prefix + 'Sts:State-I', active_state)
 
-        for transition, (active, reachable) in transitions.items():
-            prefix = '{{Gov:{}-Tr:{}-{}}}'.format(gov_name, *transition)
-            self.setParam(prefix + 'Sts:Active-Sts', active)
-            self.setParam(prefix + 'Sts:Reach-Sts', reachable)
+        for transition, transition_updates in transitions.items():
+            active_param, reach_param = pv_transition[(gov_name, transition)]
+            set_param(active_param, transition_updates.active)
+            set_param(reach_param, transition_updates.reachable)
 
         for device_name, positions in devices.items():
             for position_name, position_value in positions.items():
-                param = '{{Gov:{}-Dev:{}}}Pos:{}-Pos'.format(gov_name, device_name, position_name)
-                self.setParam(param, position_value)
+                set_param(pv_pos[(gov_name, device_name, position_name)], position_value)
 
-        self.updatePVs()
+        # Only remember the update once all of it was applied, so that a failed update is retried
+        self._fingerprints[gov_name] = fingerprint
+
+    def _set_if_changed(self, reason, value):
+        """
+        Sets a PV value, unless it was already set to that value.
+
+        :param reason: str
+            The PV name
+        :param value: any
+            The new value of the PV
+        """
+        if reason not in self._last or self._last[reason] != value:
+            self._last[reason] = value
+            self.setParam(reason, value)
 
     def read(self, reason):
         """
@@ -144,19 +294,16 @@ class GovernorDriver(Driver):
             The PV name
         :return: The value of the PV
         """
-        gov_status = re.match(r'\{Gov:(.+)\}Sts:Status-Sts', reason)
-        gov_status_message = re.match(r'\{Gov:(.+)\}Sts:Msg-Sts', reason)
+        handler = self._read_routes.get(reason)
 
         if reason == "{Gov}Active-Sel":
             return self._active
         elif reason == "{Gov}Config-Sel":
-            return list(self._governors.keys()).index(self._active_governor)
+            return self._active_idx
         elif reason == "{Gov}Cmd:Abort-Cmd":
             return 0
-        elif gov_status is not None:
-            return self._governors[gov_status.group(1)].status
-        elif gov_status_message is not None:
-            return self._governors[gov_status_message.group(1)].status_message
+        elif handler is not None:
+            return handler()
         else:
             self._logger.debug("couldn't match reason %s", reason)
             return self.getParam(reason)
@@ -173,13 +320,6 @@ class GovernorDriver(Driver):
         self._logger.debug("write(reason=%s,value=%s)", reason, value)
         status = True
 
-        gov_abort = re.match(r'\{Gov:(?P<gov_name>.+)\}Cmd:Abort-Cmd', reason)
-        gov_go = re.match(r'\{Gov:(?P<gov_name>.+)\}Cmd:Go-Cmd', reason)
-        # Limit reason is something like: {Gov:Human-Dev:bsz}SE:HLim-Pos
-        dev_limit = re.match(r'\{Gov:(?P<gov_name>.+)-Dev:(?P<dev_name>.*)\}(?P<state_name>.*):(?P<limit>.*)-Pos', reason)
-        # Position reason is something like {Gov:Human-Dev:bsy}Pos:Down-Pos
-        dev_pos = re.match(r'\{Gov:(?P<gov_name>.+)-Dev:(?P<dev_name>.*)\}Pos:(?P<pos_name>.*)-Pos', reason)
-
         if reason == "{Gov}Active-Sel":
             self._active = bool(value)
         elif reason == "{Gov}Cmd:Abort-Cmd":
@@ -191,62 +331,90 @@ class GovernorDriver(Driver):
             running = False
         elif self._active:
             if reason == "{Gov}Config-Sel":
-                next_governor = tuple(self._governors.keys())[value]
+                next_governor = self._gov_names[value]
                 if next_governor != self._active_governor:
                     self._logger.info("Changing governor from [%s] to [%s]", self._active_governor, next_governor)
                     if not self._governors[self._active_governor].set_enabled(False):
                         status = False
                     else:
                         self._active_governor = next_governor
+                        self._active_idx = value
                         self._governors[self._active_governor].set_enabled(True)
                 else:
                     status = False
-
-            elif gov_abort is not None:
-                governor = self._governors[gov_abort.group('gov_name')]
-                governor.abort()
-
-            elif gov_go is not None:
-                governor = self._governors[gov_go.group('gov_name')]
-                if value in governor.reachable_states():
-                    # Do the transition on our worker
-                    self._worker_q.put((
-                        partial(governor.do_transition, value),
-                        partial(self.callbackPV, reason)
-                    ))
-                else:
+            else:
+                handler = self._write_routes.get(reason)
+                if handler is None:
+                    self._logger.debug("No handler for writes to %s", reason)
                     status = False
-            elif dev_limit is not None:
-                governor = self._governors[dev_limit.group('gov_name')]
-                state = dev_limit.group('state_name')
-                limit = dev_limit.group('limit')
-                device = dev_limit.group('dev_name')
-                limit = {"LLim": governor.LIMIT_LOW, "HLim": governor.LIMIT_HIGH}[limit]
-                status = governor.set_state_device_limit(state, device, limit, value)
-            elif dev_pos is not None:
-                governor = self._governors[dev_pos.group('gov_name')]
-                device, position = dev_pos.group('dev_name'), dev_pos.group('pos_name')
-
-                if device in self._sync_targets and position in self._sync_targets[device]:
-                    govs = self._governors.values()
                 else:
-                    govs = [governor]
-
-                for gov in govs:
-                    status = status and gov.set_device_position(device, position, value)
-                    if status:
-                        r = '{{Gov:{}-Dev:{}}}Pos:{}-Pos'.format(gov.name, device, position)
-                        self.setParam(r, value)
-            else:
-                status = False
+                    status = handler(reason, value)
         else:
             status = False
 
+        # Always set written PVs: setParam also clears the alarm left on the PV by a previously rejected write
         if status:
+            self._last[reason] = value
             self.setParam(reason, value)
 
         return status
 
+    def _read_status(self, gov_name):
+        return self._governors[gov_name].status
+
+    def _read_status_message(self, gov_name):
+        return self._governors[gov_name].status_message
+
+    def _write_abort(self, reason, value, gov_name):
+        """ Aborts the current transition of a governor. """
+        self._governors[gov_name].abort()
+        return True
+
+    def _write_go(self, reason, value, gov_name):
+        """ Starts a transition of a governor to the state named value. """
+        governor = self._governors[gov_name]
+        if value not in governor.reachable_states():
+            return False
+
+        # Do the transition on our worker
+        self._worker_q.append((
+            partial(governor.do_transition, value),
+            self._go_callbacks[gov_name]
+        ))
+        self._worker_event.set()
+        return True
+
+    def _write_limit(self, reason, value, gov_name, dev_name, state_name, limit):
+        """ Sets a limit of a device in a state of a governor. """
+        governor = self._governors[gov_name]
+        limit = {"LLim": governor.LIMIT_LOW, "HLim": governor.LIMIT_HIGH}[limit]
+        return governor.set_state_device_limit(state_name, dev_name, limit, value)
+
+    def _write_pos(self, reason, value, gov_name, dev_name, pos_name):
+        """ Sets a position of a device of a governor, and of all governors if the position is kept in sync. """
+        if dev_name in self._sync_targets and pos_name in self._sync_targets[dev_name]:
+            govs = self._governors.values()
+        else:
+            govs = [self._governors[gov_name]]
+
+        status = True
+        updated = []
+        pv_pos = self._pv_pos
+        for gov in govs:
+            # Stop at the first governor that rejects the position
+            if not gov.set_device_position(dev_name, pos_name, value):
+                status = False
+                break
+            updated.append(pv_pos[(gov.name, dev_name, pos_name)])
+
+        # Post the new position of all governors at once
+        for param in updated:
+            self._set_if_changed(param, value)
+        if len(updated) > 1:
+            self.updatePVs()
+        return status
+
+
 running = True
 if __name__ == '__main__':
     # Accepted arguments
@@ -265,7 +433,8 @@ if __name__ == '__main__':
     logging.info("The Governor")
 
     # Check configuration files for errors
-    configs = [ConfigManager(config) for config in args.config]
+    # Cached configurations were checked when they were cached: check them again when asked to
+    configs = [ConfigManager.load(config, mutable=False, use_cache=not args.check_config) for config in args.config]
     for config in configs:
         if not config.ok:
             logging.error("Invalid config file %s", config.filename)
@@ -284,7 +453,11 @@ if __name__ == '__main__':
     sync_targets = {}
     if args.sync:
         with open(args.sync) as f:
-            sync_targets = yaml.load(f)
+            # The sync file only holds plain mappings of devices to targets, no round-trip data is needed
+            sync_targets = yaml.YAML(typ='safe').load(f)
+
+        # Targets are looked up on every position write, keep them as sets
+        sync_targets = {dev_name: frozenset(dev_targets) for dev_name, dev_targets in sync_targets.items()}
 
     # Crude check on sync file
     for dev_name, dev_targets in sync_targets.items():
@@ -299,11 +472,12 @@ if __name__ == '__main__':
 
     # Create the pcaspy server (IOC) and all of its PVs
     server = SimpleServer()
+    pvdb = {}
 
     # General PVs that control all Governors
 
     # Select whether governors are active (can transition to a different state)
-    server.createPV(args.prefix, {
+    pvdb.update({
         '{Gov}Active-Sel': {
             'type': 'enum',
             'enums': ['Inactive', 'Active'],
@@ -312,7 +486,7 @@ if __name__ == '__main__':
     })
 
     # Select which governor to use
-    server.createPV(args.prefix, {
+    pvdb.update({
         '{Gov}Config-Sel': {
             'type': 'enum',
             'enums': [config['name'] for config in configs],
@@ -321,7 +495,7 @@ if __name__ == '__main__':
     })
 
     # List of all existing governors
-    server.createPV(args.prefix, {
+    pvdb.update({
         '{Gov}Sts:Configs-I': {
             'type': 'string',
             'value': sorted(config['name'] for config in configs),
@@ -330,7 +504,7 @@ if __name__ == '__main__':
     })
 
     # Abort all governors
-    server.createPV(args.prefix, {
+    pvdb.update({
         '{Gov}Cmd:Abort-Cmd': {
             'type': 'int',
             'value': 0
@@ -338,7 +512,7 @@ if __name__ == '__main__':
     })
 
     # Kill entire IOC
-    server.createPV(args.prefix, {
+    pvdb.update({
         '{Gov}Cmd:Kill-Cmd': {
             'type': 'int',
             'value': 0
@@ -348,9 +522,11 @@ if __name__ == '__main__':
     # Governor-specific PVs
     for gov_name, governor in governors.items():
         gov_prefix = "{{Gov:{}}}".format(gov_name)
+        state_names = sorted(governor.states)
+        device_names = sorted(governor.devices)
 
         # Abort this governor
-        server.createPV(args.prefix, {
+        pvdb.update({
             gov_prefix+'Cmd:Abort-Cmd': {
                 'type': 'int',
                 'value': 0
@@ -359,7 +535,7 @@ if __name__ == '__main__':
 
         # Command: write the desired destination state name
         # to this PV to start a transition
-        server.createPV(args.prefix, {
+        pvdb.update({
             gov_prefix+'Cmd:Go-Cmd': {
                 'type': 'string',
                 'value': "",
@@ -368,7 +544,7 @@ if __name__ == '__main__':
         })
 
         # Governor's status
-        server.createPV(args.prefix, {
+        pvdb.update({
             gov_prefix+'Sts:Status-Sts': {
                 'type': 'enum',
                 'enums': ['Idle', 'Busy', 'Disabled', 'FAULT'],
@@ -382,7 +558,7 @@ if __name__ == '__main__':
         })
 
         # Governor's message
-        server.createPV(args.prefix, {
+        pvdb.update({
             gov_prefix+'Sts:Msg-Sts': {
                 'type': 'string',
                 'value': "",
@@ -391,25 +567,25 @@ if __name__ == '__main__':
         })
 
         # All existing states
-        server.createPV(args.prefix, {
+        pvdb.update({
             gov_prefix+'Sts:States-I': {
                 'type': 'string',
-                'value': sorted(governor.states),
-                'count': len(governor.states),
+                'value': state_names,
+                'count': len(state_names),
             }
         })
 
         # All existing devices
-        server.createPV(args.prefix, {
+        pvdb.update({
             gov_prefix+'Sts:Devs-I': {
                 'type': 'string',
-                'value': sorted(governor.devices),
-                'count': len(governor.devices),
+                'value': device_names,
+                'count': len(device_names),
             }
         })
 
         # Current state
-        server.createPV(args.prefix, {
+        pvdb.update({
             gov_prefix+'Sts:State-I': {
                 'type': 'string',
                 'value': ''
@@ -417,16 +593,16 @@ if __name__ == '__main__':
         })
 
         # States reachable from current state
-        server.createPV(args.prefix, {
+        pvdb.update({
             gov_prefix+'Sts:Reach-I': {
                 'type': 'string',
                 'value': [''],
-                'count': len(governor.states),
+                'count': len(state_names),
             }
         })
 
         # Busy transitioning
-        server.createPV(args.prefix, {
+        pvdb.update({
             gov_prefix+'Sts:Busy-Sts': {
                 'type': 'enum',
                 'enums': ['No', 'Yes'],
@@ -434,42 +610,37 @@ if __name__ == '__main__':
             }
         })
 
-        # All existing devices
-        server.createPV(args.prefix, {
-            gov_prefix+'Sts:Devs-I': {
-                'type': 'string',
-                'value': list(governor.devices),
-                'count': len(governor.devices)
-            }
-        })
-
         for device_name, device in governor.devices.items():
-            server.createPV(args.prefix, {
+            positions = list(device.positions)
+            pvdb.update({
                 '{{Gov:{}-Dev:{}}}Sts:Tgts-I'.format(gov_name, device_name): {
                     'type': 'string',
-                    'value': list(device.positions),
-                    'count': len(device.positions),
+                    'value': positions,
+                    'count': len(positions),
                 }
             })
 
-            for target in device.positions:
+            for target in positions:
                 name = '{{Gov:{}-Dev:{}}}Pos:{}-Pos'.format(gov_name, device_name, target)
-                server.createPV(args.prefix, {name: {'type': 'float', 'value': 0}})
+                pvdb[name] = {'type': 'float', 'value': 0}
 
-            for state_name in governor.states:
+            for state_name in state_names:
                 for lim in ('LLim', 'HLim'):
                     name = '{{Gov:{}-Dev:{}}}{}:{}-Pos'.format(gov_name, device_name, state_name, lim)
-                    server.createPV(args.prefix, {name: {'type': 'float', 'value': 0}})
+                    pvdb[name] = {'type': 'float', 'value': 0}
 
-        for state_name in governor.states:
+        for state_name in state_names:
             dev = '{{Gov:{}-St:{}}}'.format(gov_name, state_name)
-            server.createPV(args.prefix, {dev + 'Sts:Reach-Sts': {'type': 'int', 'value': 0}})
-            server.createPV(args.prefix, {dev + 'Sts:Active-Sts': {'type': 'int', 'value': 0}})
+            pvdb[dev + 'Sts:Reach-Sts'] = {'type': 'int', 'value': 0}
+            pvdb[dev + 'Sts:Active-Sts'] = {'type': 'int', 'value': 0}
 
             for next_state in governor.reachable_states(state_name):
                 dev = '{{Gov:{}-Tr:{}-{}}}'.format(gov_name, state_name, next_state)
-                server.createPV(args.prefix, {dev + 'Sts:Active-Sts': {'type': 'int', 'value': 0}})
-                server.createPV(args.prefix, {dev + 'Sts:Reach-Sts': {'type': 'int', 'value': 0}})
+                pvdb[dev + 'Sts:Active-Sts'] = {'type': 'int', 'value': 0}
+                pvdb[dev + 'Sts:Reach-Sts'] = {'type': 'int', 'value': 0}
+
+    # Register all PVs at once
+    server.createPV(args.prefix, pvdb)
 
     # Create a Driver that will manage all Governors
     driver = GovernorDriver(governors, configs[0]["name"], sync_targets)